@@ -20,8 +20,21 @@ a fast-import stream.
 """
 from __future__ import division
 
-import re
+import array
+import functools
+import operator
 import stat
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    )
 
 from .helpers import (
     newobject as object,
@@ -39,11 +52,38 @@ from .helpers import (
 GIT_FAST_IMPORT_NEEDS_EXTRA_SPACE_AFTER_QUOTE = False
 
 
-# Lists of command names
-COMMAND_NAMES = [b'blob', b'checkpoint', b'commit', b'feature', b'progress',
-                 b'reset', b'tag']
-FILE_COMMAND_NAMES = [b'filemodify', b'filedelete', b'filecopy', b'filerename',
-                      b'filedeleteall']
+# Command names
+BLOB_COMMAND = b'blob'
+CHECKPOINT_COMMAND = b'checkpoint'
+COMMIT_COMMAND = b'commit'
+FEATURE_COMMAND = b'feature'
+PROGRESS_COMMAND = b'progress'
+RESET_COMMAND = b'reset'
+TAG_COMMAND = b'tag'
+COMMAND_NAMES = [
+    BLOB_COMMAND,
+    CHECKPOINT_COMMAND,
+    COMMIT_COMMAND,
+    FEATURE_COMMAND,
+    PROGRESS_COMMAND,
+    RESET_COMMAND,
+    TAG_COMMAND,
+    ]
+
+# File command names
+FILEMODIFY_COMMAND = b'filemodify'
+FILEDELETE_COMMAND = b'filedelete'
+FILECOPY_COMMAND = b'filecopy'
+FILERENAME_COMMAND = b'filerename'
+FILEDELETEALL_COMMAND = b'filedeleteall'
+NOTEMODIFY_COMMAND = b'notemodify'
+FILE_COMMAND_NAMES = [
+    FILEMODIFY_COMMAND,
+    FILEDELETE_COMMAND,
+    FILECOPY_COMMAND,
+    FILERENAME_COMMAND,
+    FILEDELETEALL_COMMAND,
+    ]
 
 # Feature names
 MULTIPLE_AUTHORS_FEATURE = b'multiple-authors'
@@ -55,14 +95,83 @@ FEATURE_NAMES = [
     EMPTY_DIRS_FEATURE,
     ]
 
+# Tuple of name, email, secs-since-epoch and utc-offset-secs
+WhoWhen = Tuple[
+    Union[bytes, str], Optional[Union[bytes, str]], Union[int, float], int]
+
+
+def _make_dump_fields(fields, binary):
+    """Generate a function dumping the given fields of a command.
+
+    The result is equivalent to the non-verbose ImportCommand.dump_str
+    with the default fields, with the field list and the check for binary
+    fields resolved when the function is generated.
+
+    :param fields: sequence of field names, which must be identifiers
+    :param binary: set of field names not to display
+    """
+    exprs = []
+    for field in fields:
+        if not field.isidentifier():
+            raise ValueError("invalid field name %r" % (field,))
+        if field in binary:
+            exprs.append("(%r if self.%s is not None else 'None')" % (
+                repr(b'(...)'), field))
+        else:
+            exprs.append("repr(self.%s)" % (field,))
+    source = "def dump_fields(self):\n    return '\\t'.join((%s,))\n" % (
+        ", ".join(exprs),)
+    namespace = {}
+    exec(source, {}, namespace)
+    return namespace['dump_fields']
+
+
+class _DataField(object):
+    """A data or message field caching its 'data <length>' header line.
+
+    The value is kept in the '_<name>' slot of the owning class and the
+    encoded header in the '_<name>_header' slot, so the header is only
+    formatted when the value is set. The header is None if the value is.
+    """
+
+    def __set_name__(self, owner, name):
+        self._value = getattr(owner, '_' + name)
+        self._header = getattr(owner, '_%s_header' % (name,))
+
+    def __get__(self, obj: Any, objtype: Any = None) -> Any:
+        if obj is None:
+            return self
+        return self._value.__get__(obj, objtype)
+
+    def __set__(self, obj: Any, value: Optional[bytes]) -> None:
+        self._value.__set__(obj, value)
+        if value is None:
+            header = None
+        else:
+            header = ('\ndata %d\n' % len(value)).encode('ascii')
+        self._header.__set__(obj, header)
+
 
 class ImportCommand(object):
     """Base class for import commands."""
 
+    __slots__ = ('name',)
+
+    # Public field names, in display order, used by dump_str
+    _public_fields: Tuple[str, ...] = ('name',)
+    # Field names not to display
+    _binary: FrozenSet[str] = frozenset()
+    # dump_str of the default fields, generated for each class
+    _dump_fields: ClassVar[Callable[['ImportCommand'], str]]
+
+    name: bytes
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dump_fields = _make_dump_fields(cls._public_fields, cls._binary)
+
     def __init__(self, name):
         self.name = name
-        # List of field names not to display
-        self._binary = []
 
     def __str__(self):
         return repr(self)
@@ -75,6 +184,15 @@ class ImportCommand(object):
             'An implementation of __bytes__ is required'
         )
 
+    def write_to(self, f):
+        """Write this command to the binary file-like object f.
+
+        This writes the same bytes as bytes(cmd). Commands carrying file
+        contents override it to write the contents directly, without
+        building the complete command in memory first.
+        """
+        f.write(bytes(self))
+
     def dump_str(self, names=None, child_lists=None, verbose=False):
         """Dump fields as a string.
 
@@ -88,63 +206,138 @@ class ImportCommand(object):
             display fields as a dictionary; if False, dump just the field
             values with tabs between them
         """
-        interesting = {}
         if names is None:
-            fields = [
-                k for k in list(self.__dict__.keys())
-                if not k.startswith(b'_')
-            ]
+            if not verbose:
+                return self._dump_fields()
+            fields = type(self)._public_fields
         else:
             fields = names
+        binary = self._binary
+        values = []
         for field in fields:
-            value = self.__dict__.get(field)
-            if field in self._binary and value is not None:
+            value = getattr(self, field, None)
+            if field in binary and value is not None:
                 value = b'(...)'
-            interesting[field] = value
+            values.append(value)
         if verbose:
+            interesting = dict(zip(fields, values))
             return "%s: %s" % (self.__class__.__name__, interesting)
         else:
-            return "\t".join([repr(interesting[k]) for k in fields])
+            return "\t".join([repr(value) for value in values])
+
+
+ImportCommand._dump_fields = _make_dump_fields(
+    ImportCommand._public_fields, ImportCommand._binary)
 
 
 class BlobCommand(ImportCommand):
 
+    __slots__ = ('mark', '_data', '_data_header', 'lineno', '_id')
+    _public_fields = ImportCommand._public_fields + (
+        'mark', 'data', 'lineno', 'id')
+    _binary = frozenset(['data'])
+
+    data = _DataField()
+
+    mark: Optional[bytes]
+    lineno: int
+    _id: Optional[bytes]
+
     def __init__(self, mark, data, lineno=0):
-        ImportCommand.__init__(self, b'blob')
+        ImportCommand.__init__(self, BLOB_COMMAND)
         self.mark = mark
         self.data = data
         self.lineno = lineno
-        # Provide a unique id in case the mark is missing
-        if mark is None:
-            self.id = b'@' + ("%d" % lineno).encode('utf-8')
-        else:
-            self.id = b':' + mark
-        self._binary = [b'data']
+        self._id = None
+
+    @property
+    def id(self):
+        """A unique id for this blob, even if the mark is missing."""
+        if self._id is None:
+            if self.mark is None:
+                self._id = b'@' + ('%d' % self.lineno).encode('utf-8')
+            else:
+                self._id = b':' + self.mark
+        return self._id
+
+    @id.setter
+    def id(self, id):
+        self._id = id
 
     def __bytes__(self):
+        buf = [b'blob']
+        if self.mark is not None:
+            buf += (b'\nmark :', self.mark)
+        buf += (self._data_header, self.data)
+        return b''.join(buf)
+
+    def write_to(self, f):
+        """Write this command to the binary file-like object f.
+
+        Unlike bytes(cmd), the blob data is written as is rather than
+        copied into a new bytes object together with the header.
+        """
         if self.mark is None:
-            mark_line = b''
+            f.write(b'blob')
         else:
-            mark_line = b"\nmark :" + self.mark
-        return (b'blob' + mark_line + b'\n' +
-                ('data %d\n' % len(self.data)).encode('utf-8') + self.data)
+            f.write(b'blob\nmark :' + self.mark)
+        f.write(self._data_header)
+        f.write(self.data)
 
 
 class CheckpointCommand(ImportCommand):
 
+    __slots__ = ()
+
+    def __new__(cls):
+        # Checkpoints carry no state, so a single instance is shared
+        return _stateless_instance(cls)
+
     def __init__(self):
-        ImportCommand.__init__(self, b'checkpoint')
+        ImportCommand.__init__(self, CHECKPOINT_COMMAND)
 
     def __bytes__(self):
         return b'checkpoint'
 
 
+class _FileCommands(tuple):
+    """A tuple of file commands which can also be called to iterate it."""
+
+    __slots__ = ()
+
+    def __call__(self):
+        return iter(self)
+
+
 class CommitCommand(ImportCommand):
 
+    __slots__ = ('ref', 'mark', 'author', 'committer', '_message',
+                 '_message_header', 'from_', 'merges', '_file_cmds',
+                 'more_authors', 'properties', 'lineno', '_id')
+    _public_fields = ImportCommand._public_fields + (
+        'ref', 'mark', 'author', 'committer', 'message', 'from_', 'merges',
+        'file_iter', 'more_authors', 'properties', 'lineno', 'id')
+    _binary = frozenset(['file_iter'])
+
+    message = _DataField()
+
+    ref: bytes
+    mark: Union[bytes, int, None]
+    author: Optional[WhoWhen]
+    committer: WhoWhen
+    from_: Optional[bytes]
+    merges: Optional[List[bytes]]
+    _file_cmds: '_FileCommands'
+    more_authors: Optional[List[WhoWhen]]
+    properties: Optional[
+        Dict[Union[bytes, str], Optional[Union[bytes, str]]]]
+    lineno: int
+    _id: Optional[bytes]
+
     def __init__(self, ref, mark, author, committer, message, from_,
                  merges, file_iter, lineno=0, more_authors=None,
                  properties=None):
-        ImportCommand.__init__(self, b'commit')
+        ImportCommand.__init__(self, COMMIT_COMMAND)
         self.ref = ref
         self.mark = mark
         self.author = author
@@ -156,25 +349,46 @@ class CommitCommand(ImportCommand):
         self.more_authors = more_authors
         self.properties = properties
         self.lineno = lineno
-        self._binary = [b'file_iter']
-        # Provide a unique id in case the mark is missing
-        if self.mark is None:
-            self.id = b'@' + ('%d' % lineno).encode('utf-8')
-        else:
-            if isinstance(self.mark, (int)):
-                self.id = b':' + str(self.mark).encode('utf-8')
+        self._id = None
+
+    @property
+    def id(self):
+        """A unique id for this commit, even if the mark is missing."""
+        if self._id is None:
+            if self.mark is None:
+                self._id = b'@' + ('%d' % self.lineno).encode('utf-8')
+            elif isinstance(self.mark, (int)):
+                self._id = b':' + str(self.mark).encode('utf-8')
             else:
-                self.id = b':' + self.mark
+                self._id = b':' + self.mark
+        return self._id
 
-    def copy(self, **kwargs):
-        if not isinstance(self.file_iter, list):
-            self.file_iter = list(self.file_iter)
+    @id.setter
+    def id(self, id):
+        self._id = id
+
+    @property
+    def file_iter(self):
+        """The file commands of this commit, as a tuple.
 
+        For compatibility with code treating file_iter as a callable,
+        calling it returns an iterator over the file commands.
+        """
+        return self._file_cmds
+
+    @file_iter.setter
+    def file_iter(self, file_iter):
+        # file_iter may be a callable, an iterable or None; materialize it
+        # once so the file commands can be walked any number of times.
+        if callable(file_iter):
+            file_iter = file_iter()
+        self._file_cmds = _FileCommands(file_iter or ())
+
+    def copy(self, **kwargs):
         fields = dict(
-            (key, value)
-            for key, value in self.__dict__.items()
+            (key, getattr(self, key))
+            for key in self._public_fields
             if key not in ('id', 'name')
-            if not key.startswith('_')
         )
 
         fields.update(kwargs)
@@ -189,70 +403,45 @@ class CommitCommand(ImportCommand):
             @todo the name to_string is ambiguous since the method actually
                 returns bytes.
         """
-        if self.mark is None:
-            mark_line = b''
-        else:
-            if isinstance(self.mark, (int)):
-                mark_line = b'\nmark :' + str(self.mark).encode('utf-8')
-            else:
-                mark_line = b'\nmark :' + self.mark
-
-        if self.author is None:
-            author_section = b''
-        else:
-            author_section = b'\nauthor ' + format_who_when(self.author)
-            if use_features and self.more_authors:
-                for author in self.more_authors:
-                    author_section += b'\nauthor ' + format_who_when(author)
-
-        committer = b'committer ' + format_who_when(self.committer)
-
-        if self.message is None:
-            msg_section = b''
-        else:
-            msg = self.message
-            msg_section = ('\ndata %d\n' % len(msg)).encode('ascii') + msg
-        if self.from_ is None:
-            from_line = b''
-        else:
-            from_line = b'\nfrom ' + self.from_
-        if self.merges is None:
-            merge_lines = b''
-        else:
-            merge_lines = b''.join(
-                [b'\nmerge ' + m for m in self.merges])
-        if use_features and self.properties:
-            property_lines = []
-            for name in sorted(self.properties):
-                value = self.properties[name]
-                property_lines.append(b'\n' + format_property(name, value))
-            properties_section = b''.join(property_lines)
-        else:
-            properties_section = b''
-        if self.file_iter is None:
-            filecommands = b''
-        else:
-            if include_file_contents:
-                filecommands = b''.join(
-                    [b'\n' + bytes(c) for c in self.iter_files()])
-            else:
-                filecommands = b''.join(
-                    [b'\n' + str(c) for c in self.iter_files()])
-        return b''.join([
-            b'commit ',
-            self.ref,
-            mark_line,
-            author_section + b'\n',
-            committer,
-            msg_section,
-            from_line,
-            merge_lines,
-            properties_section,
-            filecommands])
+        buf = self._header_chunks(use_features)
+        for c in self._file_cmds:
+            buf += (b'\n', c.to_string(
+                include_file_contents=include_file_contents))
+        return b''.join(buf)
+
+    def write_to(self, f, use_features=True):
+        f.write(b''.join(self._header_chunks(use_features)))
+        for c in self._file_cmds:
+            f.write(b'\n')
+            c.write_to(f)
+
+    def _header_chunks(self, use_features):
+        """Return the fragments of everything but the file commands."""
+        more_authors = properties = None
+        if use_features:
+            # Additional authors are only written after a first one
+            if self.author is not None:
+                more_authors = self.more_authors
+            properties = self.properties
+        return [
+            b'commit ', self.ref,
+            _optional_line(b'\nmark :', self.mark, _format_mark),
+            _optional_line(b'\nauthor ', self.author, format_who_when),
+            b''.join(
+                b'\nauthor ' + format_who_when(author)
+                for author in more_authors or ()),
+            b'\ncommitter ', format_who_when(self.committer),
+            _optional_line(self._message_header, self.message),
+            _optional_line(b'\nfrom ', self.from_),
+            b''.join(b'\nmerge ' + m for m in self.merges or ()),
+            b''.join(
+                b'\n' + format_property(name, properties[name])
+                for name in sorted(properties or ())),
+            ]
 
     def dump_str(self, names=None, child_lists=None, verbose=False):
         result = [ImportCommand.dump_str(self, names, verbose=verbose)]
-        for f in self.iter_files():
+        for f in self._file_cmds:
             if child_lists is None:
                 continue
             try:
@@ -264,16 +453,79 @@ class CommitCommand(ImportCommand):
 
     def iter_files(self):
         """Iterate over files."""
-        # file_iter may be a callable or an iterator
-        if callable(self.file_iter):
-            return self.file_iter()
-        return iter(self.file_iter)
+        return iter(self._file_cmds)
+
+
+class CommitArray(object):
+    """Column-wise storage for a large number of commits.
+
+    Rather than keeping a CommitCommand object per commit, each field is
+    stored in its own list (or, for line numbers, a packed array).
+    Indexing returns a new CommitCommand built from the stored fields;
+    slicing returns a new CommitArray.
+    """
+
+    # Columns holding CommitCommand constructor arguments other than lineno
+    _fields = ('ref', 'mark', 'author', 'committer', 'message', 'from_',
+               'merges', 'file_iter', 'more_authors', 'properties')
+
+    __slots__ = _fields + ('lineno', '_id')
+
+    def __init__(self, commits=()):
+        for field in self._fields:
+            setattr(self, field, [])
+        self.lineno = array.array('q')
+        # Ids of the commits, so ones assigned rather than derived are kept
+        self._id = []
+        self.extend(commits)
+
+    def __len__(self):
+        return len(self.lineno)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            result = CommitArray()
+            for field in self.__slots__:
+                setattr(result, field, getattr(self, field)[i])
+            return result
+        i = operator.index(i)
+        cmd = CommitCommand(lineno=self.lineno[i], **dict(
+            (field, getattr(self, field)[i]) for field in self._fields))
+        cmd._id = self._id[i]
+        return cmd
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, cmd):
+        """Add the fields of a CommitCommand."""
+        # Read every field and store the line number, the only column
+        # that can reject a value, before growing any other column
+        values = [getattr(cmd, field) for field in self._fields]
+        cmd_id = cmd._id
+        self.lineno.append(operator.index(cmd.lineno))
+        for field, value in zip(self._fields, values):
+            getattr(self, field).append(value)
+        self._id.append(cmd_id)
+
+    def extend(self, cmds):
+        """Add the fields of each of an iterable of CommitCommands."""
+        for cmd in cmds:
+            self.append(cmd)
 
 
 class FeatureCommand(ImportCommand):
 
+    __slots__ = ('feature_name', 'value', 'lineno')
+    _public_fields = ImportCommand._public_fields + __slots__
+
+    feature_name: bytes
+    value: Optional[bytes]
+    lineno: int
+
     def __init__(self, feature_name, value=None, lineno=0):
-        ImportCommand.__init__(self, b'feature')
+        ImportCommand.__init__(self, FEATURE_COMMAND)
         self.feature_name = feature_name
         self.value = value
         self.lineno = lineno
@@ -288,8 +540,13 @@ class FeatureCommand(ImportCommand):
 
 class ProgressCommand(ImportCommand):
 
+    __slots__ = ('message',)
+    _public_fields = ImportCommand._public_fields + __slots__
+
+    message: bytes
+
     def __init__(self, message):
-        ImportCommand.__init__(self, b'progress')
+        ImportCommand.__init__(self, PROGRESS_COMMAND)
         self.message = message
 
     def __bytes__(self):
@@ -298,8 +555,14 @@ class ProgressCommand(ImportCommand):
 
 class ResetCommand(ImportCommand):
 
+    __slots__ = ('ref', 'from_')
+    _public_fields = ImportCommand._public_fields + __slots__
+
+    ref: bytes
+    from_: Optional[bytes]
+
     def __init__(self, ref, from_):
-        ImportCommand.__init__(self, b'reset')
+        ImportCommand.__init__(self, RESET_COMMAND)
         self.ref = ref
         self.from_ = from_
 
@@ -318,45 +581,75 @@ class ResetCommand(ImportCommand):
 
 class TagCommand(ImportCommand):
 
+    __slots__ = ('id', 'from_', 'tagger', '_message', '_message_header')
+    _public_fields = ImportCommand._public_fields + (
+        'id', 'from_', 'tagger', 'message')
+
+    message = _DataField()
+
+    id: bytes
+    from_: Optional[bytes]
+    tagger: Optional[WhoWhen]
+
     def __init__(self, id, from_, tagger, message):
-        ImportCommand.__init__(self, b'tag')
+        ImportCommand.__init__(self, TAG_COMMAND)
         self.id = id
         self.from_ = from_
         self.tagger = tagger
         self.message = message
 
     def __bytes__(self):
-        if self.from_ is None:
-            from_line = b''
-        else:
-            from_line = b'\nfrom ' + self.from_
-        if self.tagger is None:
-            tagger_line = b''
-        else:
-            tagger_line = b'\ntagger ' + format_who_when(self.tagger)
-        if self.message is None:
-            msg_section = b''
-        else:
-            msg = self.message
-            msg_section = ('\ndata %d\n' % len(msg)).encode('ascii') + msg
-        return b'tag ' + self.id + from_line + tagger_line + msg_section
+        buf = [b'tag ', self.id]
+        if self.from_ is not None:
+            buf += (b'\nfrom ', self.from_)
+        if self.tagger is not None:
+            buf += (b'\ntagger ', format_who_when(self.tagger))
+        if self.message is not None:
+            buf += (self._message_header, self.message)
+        return b''.join(buf)
 
 
 class FileCommand(ImportCommand):
     """Base class for file commands."""
-    pass
+
+    __slots__ = ()
+
+    def to_string(self, include_file_contents=False):
+        return bytes(self)
+
+
+# Map of file modes to their representation in a filemodify command
+_MODE_STRINGS = {
+    0o755: b'755',
+    0o100755: b'755',
+    0o644: b'644',
+    0o100644: b'644',
+    0o40000: b'040000',
+    0o120000: b'120000',
+    0o160000: b'160000',
+    }
 
 
 class FileModifyCommand(FileCommand):
 
+    __slots__ = ('path', 'mode', 'dataref', '_data', '_data_header')
+    _public_fields = FileCommand._public_fields + (
+        'path', 'mode', 'dataref', 'data')
+    _binary = frozenset(['data'])
+
+    data = _DataField()
+
+    path: bytes
+    mode: int
+    dataref: Optional[bytes]
+
     def __init__(self, path, mode, dataref, data):
         # Either dataref or data should be null
-        FileCommand.__init__(self, b'filemodify')
+        FileCommand.__init__(self, FILEMODIFY_COMMAND)
         self.path = check_path(path)
         self.mode = mode
         self.dataref = dataref
         self.data = data
-        self._binary = [b'data']
 
     def __bytes__(self):
         return self.to_string(include_file_contents=True)
@@ -365,18 +658,10 @@ class FileModifyCommand(FileCommand):
         return self.to_string(include_file_contents=False)
 
     def _format_mode(self, mode):
-        if mode in (0o755, 0o100755):
-            return b'755'
-        elif mode in (0o644, 0o100644):
-            return b'644'
-        elif mode == 0o40000:
-            return b'040000'
-        elif mode == 0o120000:
-            return b'120000'
-        elif mode == 0o160000:
-            return b'160000'
-        else:
-            raise AssertionError('Unknown mode %o' % mode)
+        try:
+            return _MODE_STRINGS[mode]
+        except KeyError:
+            raise AssertionError('Unknown mode %o' % mode) from None
 
     def to_string(self, include_file_contents=False):
         datastr = b''
@@ -385,9 +670,7 @@ class FileModifyCommand(FileCommand):
         elif self.dataref is None:
             dataref = b'inline'
             if include_file_contents:
-                datastr = (
-                    ('\ndata %d\n' % len(self.data)).encode('ascii') +
-                    self.data)
+                datastr = self._data_header + self.data
         else:
             dataref = self.dataref
         path = format_path(self.path)
@@ -395,49 +678,74 @@ class FileModifyCommand(FileCommand):
         return b' '.join(
             [b'M', self._format_mode(self.mode), dataref, path + datastr])
 
+    def write_to(self, f):
+        f.write(self.to_string())
+        if self.dataref is None and not stat.S_ISDIR(self.mode):
+            f.write(self._data_header)
+            f.write(self.data)
+
 
 class FileDeleteCommand(FileCommand):
 
+    __slots__ = ('path',)
+    _public_fields = FileCommand._public_fields + __slots__
+
+    path: bytes
+
     def __init__(self, path):
-        FileCommand.__init__(self, b'filedelete')
+        FileCommand.__init__(self, FILEDELETE_COMMAND)
         self.path = check_path(path)
 
     def __bytes__(self):
-        return b' '.join([b'D', format_path(self.path)])
+        return b'D ' + format_path(self.path)
 
 
 class FileCopyCommand(FileCommand):
 
+    __slots__ = ('src_path', 'dest_path')
+    _public_fields = FileCommand._public_fields + __slots__
+
+    src_path: bytes
+    dest_path: bytes
+
     def __init__(self, src_path, dest_path):
-        FileCommand.__init__(self, b'filecopy')
+        FileCommand.__init__(self, FILECOPY_COMMAND)
         self.src_path = check_path(src_path)
         self.dest_path = check_path(dest_path)
 
     def __bytes__(self):
-        return b' '.join(
-            [b'C', format_path(self.src_path, quote_spaces=True),
-             format_path(self.dest_path)])
+        return (b'C ' + format_path(self.src_path, quote_spaces=True) +
+                b' ' + format_path(self.dest_path))
 
 
 class FileRenameCommand(FileCommand):
 
+    __slots__ = ('old_path', 'new_path')
+    _public_fields = FileCommand._public_fields + __slots__
+
+    old_path: bytes
+    new_path: bytes
+
     def __init__(self, old_path, new_path):
-        FileCommand.__init__(self, b'filerename')
+        FileCommand.__init__(self, FILERENAME_COMMAND)
         self.old_path = check_path(old_path)
         self.new_path = check_path(new_path)
 
     def __bytes__(self):
-        return b' '.join([
-            b'R',
-            format_path(self.old_path, quote_spaces=True),
-            format_path(self.new_path)]
-        )
+        return (b'R ' + format_path(self.old_path, quote_spaces=True) +
+                b' ' + format_path(self.new_path))
 
 
 class FileDeleteAllCommand(FileCommand):
 
+    __slots__ = ()
+
+    def __new__(cls):
+        # deleteall carries no state, so a single instance is shared
+        return _stateless_instance(cls)
+
     def __init__(self):
-        FileCommand.__init__(self, b'filedeleteall')
+        FileCommand.__init__(self, FILEDELETEALL_COMMAND)
 
     def __bytes__(self):
         return b'deleteall'
@@ -445,15 +753,34 @@ class FileDeleteAllCommand(FileCommand):
 
 class NoteModifyCommand(FileCommand):
 
+    __slots__ = ('from_', '_data', '_data_header')
+    _public_fields = FileCommand._public_fields + ('from_', 'data')
+    _binary = frozenset(['data'])
+
+    data = _DataField()
+
+    from_: bytes
+
     def __init__(self, from_, data):
-        super(NoteModifyCommand, self).__init__(b'notemodify')
+        super(NoteModifyCommand, self).__init__(NOTEMODIFY_COMMAND)
         self.from_ = from_
         self.data = data
-        self._binary = ['data']
 
     def __bytes__(self):
-        return (b'N inline :' + self.from_ +
-                ('\ndata %d\n' % len(self.data)).encode('ascii') + self.data)
+        return b'N inline :' + self.from_ + self._data_header + self.data
+
+    def write_to(self, f):
+        f.write(b'N inline :' + self.from_ + self._data_header)
+        f.write(self.data)
+
+
+def _stateless_instance(cls):
+    """Return the shared instance of a command class without any fields."""
+    instance = cls.__dict__.get('_instance')
+    if instance is None:
+        instance = ImportCommand.__new__(cls)
+        cls._instance = instance
+    return instance
 
 
 def check_path(path):
@@ -471,59 +798,74 @@ def check_path(path):
     return path
 
 
+def _optional_line(prefix, value, format=None):
+    """Format an optional value, or return b'' if the value is None.
+
+    :param prefix: bytes to put before the value
+    :param format: if not None, a callable turning the value into bytes
+    """
+    if value is None:
+        return b''
+    if format is not None:
+        value = format(value)
+    return prefix + value
+
+
+def _format_mark(mark):
+    """Format a mark, which may be an int, as bytes."""
+    if isinstance(mark, int):
+        return str(mark).encode('utf-8')
+    return mark
+
+
 def format_path(p, quote_spaces=False):
     """Format a path in utf8, quoting it if necessary."""
-    if b'\n' in p:
-        p = re.sub(b'\n', b'\\n', p)
-        quote = True
-    else:
-        quote = p[0] == b'"' or (quote_spaces and b' ' in p)
-    if quote:
-        extra = GIT_FAST_IMPORT_NEEDS_EXTRA_SPACE_AFTER_QUOTE and b' ' or b''
-        p = b'"' + p + b'"' + extra
-    return p
+    if not (b'\n' in p or p.startswith(b'"') or
+            (quote_spaces and b' ' in p)):
+        return p
+    p = (p.replace(b'\\', b'\\\\').replace(b'"', b'\\"')
+         .replace(b'\n', b'\\n'))
+    extra = GIT_FAST_IMPORT_NEEDS_EXTRA_SPACE_AFTER_QUOTE and b' ' or b''
+    return b'"' + p + b'"' + extra
 
 
 def format_who_when(fields):
     """Format tuple of name,email,secs-since-epoch,utc-offset-secs as bytes."""
-    offset = fields[3]
-    if offset < 0:
-        offset_sign = b'-'
-        offset = abs(offset)
-    else:
-        offset_sign = b'+'
-    offset_hours = offset // 3600
-    offset_minutes = offset // 60 - offset_hours * 60
+    # The same author/committer tuples recur across many commits, so
+    # formatted results are cached; other sequences, such as lists, are
+    # not hashable and are formatted directly.
+    if isinstance(fields, tuple):
+        return _cached_format_who_when(fields)
+    return _format_who_when(fields)
+
+
+def _format_who_when(fields):
+    name, email, secs, offset = fields
+    offset_sign = b'-' if offset < 0 else b'+'
+    offset_hours, offset_minutes = divmod(abs(offset) // 60, 60)
     offset_str = (
         offset_sign +
         ('%02d%02d' % (offset_hours, offset_minutes)).encode('ascii'))
-    name = fields[0]
 
     if name == b'':
         sep = b''
     else:
         sep = b' '
 
-    name = utf8_bytes_string(name)
-
-    email = fields[1]
+    return b''.join(
+        (utf8_bytes_string(name), sep, b'<', utf8_bytes_string(email), b'> ',
+         ("%d" % secs).encode('ascii'), b' ', offset_str))
 
-    email = utf8_bytes_string(email)
 
-    return b''.join(
-        (name, sep, b'<', email, b'> ',
-         ("%d" % fields[2]).encode('ascii'), b' ', offset_str))
+_cached_format_who_when = functools.lru_cache(maxsize=4096)(_format_who_when)
 
 
 def format_property(name, value):
     """Format the name and value (both unicode) of a property as a string."""
-    result = b''
     utf8_name = utf8_bytes_string(name)
-
-    result = b'property ' + utf8_name
-    if value is not None:
-        utf8_value = utf8_bytes_string(value)
-        result += (b' ' + ('%d' % len(utf8_value)).encode('ascii') +
-                   b' ' + utf8_value)
-
-    return result
+    if value is None:
+        return b'property ' + utf8_name
+    utf8_value = utf8_bytes_string(value)
+    return b''.join(
+        (b'property ', utf8_name, b' ',
+         ('%d' % len(utf8_value)).encode('ascii'), b' ', utf8_value))
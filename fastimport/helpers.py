@@ -122,6 +122,9 @@ class newobject(object):
     This is a copy/paste of the future.types.newobject class of the future
     package.
     """
+
+    __slots__ = ()
+
     def next(self):
         if hasattr(self, '__next__'):
             return type(self).__next__(self)
@@ -281,6 +281,12 @@ class ImportParser(LineBasedParser):
         # We auto-detect the date format when a date is first encountered
         self.date_parser = None
         self.features = {}
+        # Refs and paths seen so far, so repeated ones share one object
+        self._interned = {}
+
+    def _intern(self, s):
+        """Return the first seen bytes equal to s, remembering s if new."""
+        return self._interned.setdefault(s, s)
 
     def warning(self, msg):
         sys.stderr.write("warning line %d: %s\n" % (self.lineno, msg))
@@ -354,6 +360,7 @@ class ImportParser(LineBasedParser):
 
     def _parse_commit(self, ref):
         """Parse a commit command."""
+        ref = self._intern(ref)
         lineno = self.lineno
         mark = self._get_mark_if_any()
         author = self._get_user_info(b'commit', b'author', False)
@@ -423,7 +430,7 @@ class ImportParser(LineBasedParser):
     def _parse_reset(self, ref):
         """Parse a reset command."""
         from_ = self._get_from()
-        return commands.ResetCommand(ref, from_)
+        return commands.ResetCommand(self._intern(ref), from_)
 
     def _parse_tag(self, name):
         """Parse a tag command."""
@@ -581,8 +588,8 @@ class ImportParser(LineBasedParser):
             if not s.endswith(b'"'):
                 self.abort(errors.BadFormat, '?', '?', s)
             else:
-                return _unquote_c_string(s[1:-1])
-        return s
+                return self._intern(_unquote_c_string(s[1:-1]))
+        return self._intern(s)
 
     def _path_pair(self, s):
         """Parse two paths separated by a space."""
@@ -597,7 +604,7 @@ class ImportParser(LineBasedParser):
             parts[1] = parts[1][1:-1]
         elif parts[1].startswith(b'"') or parts[1].endswith(b'"'):
             self.abort(errors.BadFormat, '?', '?', s)
-        return [_unquote_c_string(part) for part in parts]
+        return [self._intern(_unquote_c_string(part)) for part in parts]
 
     def _mode(self, s):
         """Check file mode format and parse into an int.
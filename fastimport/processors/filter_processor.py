@@ -157,9 +157,11 @@ class FilterProcessor(processor.ImportProcessor):
 
     def _print_command(self, cmd):
         """Wrapper to avoid adding unnecessary blank lines."""
-        text = bytes(cmd)
-        self.outf.write(text)
-        if not text.endswith(b'\n'):
+        # Stream the command rather than building it as a single bytes
+        # object, as blobs and inline file contents can be large
+        out = _TailTrackingWriter(self.outf)
+        cmd.write_to(out)
+        if out.tail != b'\n':
             self.outf.write(b'\n')
 
     def _filter_filecommands(self, filecmd_iter):
@@ -304,3 +306,16 @@ class FilterProcessor(processor.ImportProcessor):
                 "cannot turn copy of %s into an add of %s yet" %
                 (src, dest))
         return None
+
+
+class _TailTrackingWriter(object):
+    """Forward writes to a file, remembering the last byte written."""
+
+    def __init__(self, f):
+        self._f = f
+        self.tail = b''
+
+    def write(self, data):
+        if data:
+            self.tail = data[-1:]
+        self._f.write(data)
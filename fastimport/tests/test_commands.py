@@ -15,6 +15,8 @@
 
 """Test how Commands are displayed"""
 
+import operator
+from io import BytesIO
 from unittest import TestCase
 
 from fastimport.helpers import (
@@ -36,6 +38,27 @@ class TestBlobDisplay(TestCase):
         c = commands.BlobCommand(None, b"hello world")
         self.assertEqual(b"blob\ndata 11\nhello world", bytes(c))
 
+    def test_blob_data_changed(self):
+        c = commands.BlobCommand(b"1", b"hello world")
+        c.data = b"bye"
+        self.assertEqual(b"blob\nmark :1\ndata 3\nbye", bytes(c))
+
+    def test_blob_id(self):
+        self.assertEqual(b":1", commands.BlobCommand(b"1", b"").id)
+        self.assertEqual(b"@7", commands.BlobCommand(None, b"", 7).id)
+
+    def test_blob_id_assignment(self):
+        c = commands.BlobCommand(b"1", b"")
+        c.id = b":2"
+        self.assertEqual(b":2", c.id)
+
+    def test_blob_write_to(self):
+        for mark in (b"1", None):
+            c = commands.BlobCommand(mark, b"hello world")
+            f = BytesIO()
+            c.write_to(f)
+            self.assertEqual(bytes(c), f.getvalue())
+
 
 class TestCheckpointDisplay(TestCase):
 
@@ -43,6 +66,10 @@ class TestCheckpointDisplay(TestCase):
         c = commands.CheckpointCommand()
         self.assertEqual(b'checkpoint', bytes(c))
 
+    def test_checkpoint_shared(self):
+        self.assertIs(
+            commands.CheckpointCommand(), commands.CheckpointCommand())
+
 
 class TestCommitDisplay(TestCase):
 
@@ -167,6 +194,67 @@ class TestCommitDisplay(TestCase):
             b"blah blah blah",
             bytes(c))
 
+    def test_commit_id(self):
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        for mark, lineno, expected in [
+                (b'bbb', 0, b':bbb'), (123, 0, b':123'), (None, 7, b'@7')]:
+            c = commands.CommitCommand(
+                b'refs/heads/master', mark, None, committer,
+                b'release v1.0', None, None, None, lineno=lineno)
+            self.assertEqual(expected, c.id)
+
+    def test_commit_id_assignment(self):
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        c = commands.CommitCommand(
+            b'refs/heads/master', b'bbb', None, committer,
+            b'release v1.0', None, None, None)
+        c.id = b':ccc'
+        self.assertEqual(b':ccc', c.id)
+
+    def test_commit_file_iter_reusable(self):
+        def file_cmds():
+            yield commands.FileDeleteCommand(b'readme.txt')
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        for file_iter in (file_cmds, file_cmds()):
+            c = commands.CommitCommand(
+                b'refs/heads/master', b'bbb', None, committer,
+                b'release v1.0', b':aaa', None, file_iter)
+            self.assertEqual(bytes(c), bytes(c))
+            self.assertEqual(1, len(c.file_iter))
+            self.assertEqual(
+                [b'D readme.txt'], [bytes(f) for f in c.iter_files()])
+
+    def test_commit_file_iter_callable(self):
+        file_cmds = [commands.FileDeleteCommand(b'readme.txt')]
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        c = commands.CommitCommand(
+            b'refs/heads/master', b'bbb', None, committer,
+            b'release v1.0', b':aaa', None, file_cmds)
+        self.assertEqual(file_cmds, list(c.file_iter()))
+        self.assertEqual(1, operator.length_hint(c.iter_files()))
+
+    def test_commit_to_string_without_file_contents(self):
+        file_cmds = [
+            commands.FileDeleteCommand(b'readme.txt'),
+            commands.FileModifyCommand(
+                b'NEWS', 0o100644, None, b'blah blah blah'),
+            ]
+        # user tuple is (name, email, secs-since-epoch, secs-offset-from-utc)
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        c = commands.CommitCommand(
+            b'refs/heads/master', b'bbb', None, committer,
+            b'release v1.0', b':aaa', None, file_cmds)
+        self.assertEqual(
+            b"commit refs/heads/master\n"
+            b"mark :bbb\n"
+            b"committer Joe Wong <joe@example.com> 1234567890 -0600\n"
+            b"data 12\n"
+            b"release v1.0\n"
+            b"from :aaa\n"
+            b"D readme.txt\n"
+            b"M 644 inline NEWS",
+            c.to_string())
+
     def test_commit_with_more_authors(self):
         # user tuple is (name, email, secs-since-epoch, secs-offset-from-utc)
         author = (b'Sue Wong', b'sue@example.com', 1234565432, -6 * 3600)
@@ -257,6 +345,10 @@ class TestCommitCopy(TestCase):
         self.assertIsNot(self.c, c2)
         self.assertEqual(bytes(self.c), bytes(c2))
 
+    def test_copy_keeps_file_commands(self):
+        c2 = self.c.copy()
+        self.assertEqual(list(self.c.iter_files()), list(c2.iter_files()))
+
     def test_replace_attr(self):
         c2 = self.c.copy(mark=b'ccc')
         self.assertEqual(
@@ -268,6 +360,63 @@ class TestCommitCopy(TestCase):
         self.assertRaises(TypeError, self.c.copy, invalid=True)
 
 
+class TestCommitArray(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        self.commits = [
+            commands.CommitCommand(
+                b'refs/heads/master', b'aaa', None, committer,
+                b'release v1.0', None, None,
+                [commands.FileDeleteCommand(b'readme.txt')], lineno=3),
+            commands.CommitCommand(
+                b'refs/heads/master', None, committer, committer,
+                b'release v1.1', b':aaa', [b':ccc'], None, lineno=9,
+                properties={'greeting': 'hello'}),
+            ]
+
+    def test_roundtrip(self):
+        a = commands.CommitArray(self.commits)
+        self.assertEqual(2, len(a))
+        self.assertEqual(
+            [bytes(c) for c in self.commits], [bytes(c) for c in a])
+        self.assertEqual(b'@9', a[-1].id)
+
+    def test_slice(self):
+        a = commands.CommitArray(self.commits)[1:]
+        self.assertIsInstance(a, commands.CommitArray)
+        self.assertEqual(1, len(a))
+        self.assertEqual(bytes(self.commits[1]), bytes(a[0]))
+
+    def test_invalid_index(self):
+        a = commands.CommitArray(self.commits)
+        self.assertRaises(TypeError, a.__getitem__, 'ref')
+
+    def test_failed_append(self):
+        a = commands.CommitArray(self.commits[:1])
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, 0)
+        bad = commands.CommitCommand(
+            b'refs/heads/bad', b'1', None, committer, b'bad', None, None,
+            None, lineno=None)
+        self.assertRaises(TypeError, a.append, bad)
+        self.assertEqual(1, len(a))
+        self.assertEqual([b'refs/heads/master'], a.ref)
+        self.assertEqual(bytes(self.commits[0]), bytes(a[0]))
+
+    def test_assigned_id(self):
+        self.commits[0].id = b':zzz'
+        a = commands.CommitArray(self.commits)
+        self.assertEqual(b':zzz', a[0].id)
+        self.assertEqual(b'@9', a[1].id)
+
+    def test_append(self):
+        a = commands.CommitArray()
+        a.append(self.commits[1])
+        self.assertEqual(1, len(a))
+        self.assertEqual(bytes(self.commits[1]), bytes(a[0]))
+
+
 class TestFeatureDisplay(TestCase):
 
     def test_feature(self):
@@ -351,6 +500,16 @@ class TestFileModifyDisplay(TestCase):
         self.assertEqual(
             b'M 160000 revision-id-info tree-info', bytes(c))
 
+    def test_filemodify_directory(self):
+        c = commands.FileModifyCommand(b'foo', 0o40000, None, None)
+        self.assertEqual(b'M 040000 - foo', bytes(c))
+
+    def test_filemodify_unknown_mode(self):
+        c = commands.FileModifyCommand(b'foo/bar', 0o100600, b':23', None)
+        with self.assertRaises(AssertionError) as cm:
+            bytes(c)
+        self.assertTrue(cm.exception.__suppress_context__)
+
 
 class TestFileDeleteDisplay(TestCase):
 
@@ -389,6 +548,12 @@ class TestFileDeleteAllDisplay(TestCase):
         c = commands.FileDeleteAllCommand()
         self.assertEqual(b'deleteall', bytes(c))
 
+    def test_filedeleteall_shared(self):
+        self.assertIs(
+            commands.FileDeleteAllCommand(), commands.FileDeleteAllCommand())
+        self.assertIsNot(
+            commands.FileDeleteAllCommand(), commands.CheckpointCommand())
+
 
 class TestNotesDisplay(TestCase):
 
@@ -465,6 +630,83 @@ Test test
 """, b''.join([bytes(s) for s in commits]))
 
 
+class TestDumpStr(TestCase):
+
+    def test_blob(self):
+        c = commands.BlobCommand(b"1", b"hello world")
+        self.assertEqual(
+            "b'blob'\tb'1'\tb'(...)'\t0\tb':1'", c.dump_str())
+
+    def test_blob_no_data(self):
+        c = commands.BlobCommand(None, None, 3)
+        self.assertEqual("b'blob'\tNone\tNone\t3\tb'@3'", c.dump_str())
+
+    def test_commit(self):
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, 0)
+        c = commands.CommitCommand(
+            b'refs/heads/master', b'bbb', None, committer,
+            b'release v1.0', None, None, None)
+        self.assertEqual(
+            "\t".join([
+                "b'commit'", "b'refs/heads/master'", "b'bbb'", "None",
+                repr(committer), "b'release v1.0'", "None", "None",
+                "b'(...)'", "None", "None", "0", "b':bbb'"]),
+            c.dump_str())
+
+    def test_blob_names(self):
+        c = commands.BlobCommand(b"1", b"hello world")
+        self.assertEqual("b':1'\tb'(...)'", c.dump_str(['id', 'data']))
+
+    def test_no_names(self):
+        c = commands.BlobCommand(b"1", b"hello world")
+        self.assertEqual("", c.dump_str([]))
+        self.assertEqual("BlobCommand: {}", c.dump_str([], verbose=True))
+
+    def test_verbose(self):
+        c = commands.FileDeleteCommand(b'foo/bar')
+        self.assertEqual(
+            "FileDeleteCommand: {'name': b'filedelete', 'path': b'foo/bar'}",
+            c.dump_str(verbose=True))
+
+    def test_no_instance_dict(self):
+        c = commands.FileDeleteCommand(b'foo/bar')
+        self.assertRaises(AttributeError, setattr, c, 'unknown', 1)
+
+
+class TestWriteTo(TestCase):
+
+    def assertWritesBytes(self, c):
+        f = BytesIO()
+        c.write_to(f)
+        self.assertEqual(bytes(c), f.getvalue())
+
+    def test_commit(self):
+        author = (b'Sue Wong', b'sue@example.com', 1234565432, -6 * 3600)
+        committer = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        file_cmds = [
+            commands.FileDeleteCommand(b'readme.txt'),
+            commands.FileModifyCommand(
+                b'NEWS', 0o100644, None, b'blah blah blah'),
+            commands.FileModifyCommand(b'foo', 0o40000, None, None),
+            commands.FileModifyCommand(b'bar', 0o100755, b':1', None),
+            commands.NoteModifyCommand(b'foo', b'A basic note'),
+            ]
+        c = commands.CommitCommand(
+            b'refs/heads/master', b'bbb', author, committer,
+            b'release v1.0', b':aaa', [b':ccc'], file_cmds,
+            more_authors=[author], properties={'greeting': 'hello'})
+        self.assertWritesBytes(c)
+
+    def test_tag(self):
+        tagger = (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)
+        self.assertWritesBytes(commands.TagCommand(
+            b'refs/tags/v1.0', b':xxx', tagger, b'create v1.0'))
+
+    def test_reset(self):
+        self.assertWritesBytes(
+            commands.ResetCommand(b"refs/tags/v1.0", b":xxx"))
+
+
 class TestPathChecking(TestCase):
 
     def test_filemodify_path_checking(self):
@@ -490,3 +732,76 @@ class TestPathChecking(TestCase):
         self.assertRaises(ValueError, commands.FileCopyCommand, None, b'foo')
         self.assertRaises(ValueError, commands.FileCopyCommand, b'foo', b'')
         self.assertRaises(ValueError, commands.FileCopyCommand, b'foo', None)
+
+
+class TestFormatWhoWhen(TestCase):
+
+    def test_negative_offset(self):
+        self.assertEqual(
+            b'Joe Wong <joe@example.com> 1234567890 -0600',
+            commands.format_who_when(
+                (b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600)))
+
+    def test_positive_offset_with_minutes(self):
+        self.assertEqual(
+            b'Joe Wong <joe@example.com> 1234567890 +0530',
+            commands.format_who_when(
+                (b'Joe Wong', b'joe@example.com', 1234567890, 19800)))
+
+    def test_negative_offset_with_minutes(self):
+        self.assertEqual(
+            b'Joe Wong <joe@example.com> 1234567890 -0930',
+            commands.format_who_when(
+                (b'Joe Wong', b'joe@example.com', 1234567890, -34200)))
+
+    def test_no_name(self):
+        self.assertEqual(
+            b'<joe@example.com> 1234567890 +0000',
+            commands.format_who_when(
+                (b'', b'joe@example.com', 1234567890, 0)))
+
+    def test_invalid_field(self):
+        self.assertRaises(
+            TypeError, commands.format_who_when,
+            (b'Joe Wong', b'joe@example.com', None, 0))
+
+    def test_unhashable(self):
+        self.assertEqual(
+            b'Joe Wong <joe@example.com> 1234567890 -0600',
+            commands.format_who_when(
+                [b'Joe Wong', b'joe@example.com', 1234567890, -6 * 3600]))
+
+
+class TestFormatPath(TestCase):
+
+    def test_plain(self):
+        self.assertEqual(b'foo/bar', commands.format_path(b'foo/bar'))
+
+    def test_spaces(self):
+        self.assertEqual(b'foo/b a r', commands.format_path(b'foo/b a r'))
+        self.assertEqual(
+            b'"foo/b a r"',
+            commands.format_path(b'foo/b a r', quote_spaces=True))
+
+    def test_newline(self):
+        self.assertEqual(b'"foo\\nbar"', commands.format_path(b'foo\nbar'))
+
+    def test_leading_quote(self):
+        self.assertEqual(b'"\\"foo"', commands.format_path(b'"foo'))
+
+    def test_quoted_escapes(self):
+        self.assertEqual(
+            b'"b \\\\a\\"r"',
+            commands.format_path(b'b \\a"r', quote_spaces=True))
+
+
+class TestFormatProperty(TestCase):
+
+    def test_no_value(self):
+        self.assertEqual(
+            b'property greeting', commands.format_property('greeting', None))
+
+    def test_value(self):
+        self.assertEqual(
+            b'property planet 6 w\xc3\xb6rld',
+            commands.format_property('planet', 'w\xf6rld'))
@@ -121,6 +121,22 @@ class TestNoFiltering(TestCaseWithFiltering):
     def test_params_not_given(self):
         self.assertFiltering(_SAMPLE_ALL, None, _SAMPLE_ALL)
 
+    def test_inline_data_and_empty_blob(self):
+        stream = b"""blob
+mark :1
+data 0
+commit refs/heads/master
+mark :2
+committer a <b@c> 1234798653 +0000
+data 4
+test
+M 644 inline doc/README.txt
+data 5
+hello
+M 644 :1 empty
+"""
+        self.assertFiltering(stream, None, stream)
+
     def test_params_are_none(self):
         params = {b'include_paths': None, b'exclude_paths': None}
         self.assertFiltering(_SAMPLE_ALL, params, _SAMPLE_ALL)
@@ -303,6 +303,23 @@ more data
         cmds = p.iter_commands()
         self.assertEqual([], list(cmds))
 
+    def test_refs_and_paths_shared(self):
+        s = io.BytesIO(b"""commit refs/heads/master
+committer <bugs@bunny.org> now
+data 0
+M 644 :1 foo
+commit refs/heads/master
+committer <bugs@bunny.org> now
+data 0
+D foo
+reset refs/heads/master
+""")
+        p = parser.ImportParser(s)
+        cmd1, cmd2, cmd3 = p.iter_commands()
+        self.assertIs(cmd1.ref, cmd2.ref)
+        self.assertIs(cmd1.ref, cmd3.ref)
+        self.assertIs(cmd1.file_iter[0].path, cmd2.file_iter[0].path)
+
 
 class TestStringParsing(unittest.TestCase):
 